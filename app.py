@@ -1,187 +1,383 @@
 # app.py
-import streamlit as st
-import json
-import networkx as nx
-from collections import deque, defaultdict
+import orjson
+import itertools
+import queue
+import numpy as np
 from pathlib import Path
+from types import SimpleNamespace
+from kernels import bfs
 
 # ---------------------------
 # Utilities: load KG from JSON
 # ---------------------------
+_kg_versions = itertools.count(1)
+
+class KG:
+    # Flat, integer-indexed view of the KG. Node props are kept as parallel
+    # arrays (one entry per node) and adjacency is stored CSR-style
+    # (indptr/indices, same layout as scipy.sparse.csr_matrix) with edges
+    # treated as undirected, so neighbor lookups are plain array slices.
+    def __init__(self, ids):
+        self.ids = ids
+        self.index = {nid: i for i, nid in enumerate(ids)}
+        self.n_nodes = len(ids)
+        # Distinct per loaded graph; stands in for the graph in cache keys
+        self.version = next(_kg_versions)
+        # Pool of per-node BFS work arrays reused across searches (see
+        # new_visit). The cached KG is shared by Streamlit sessions, and each
+        # rerun runs on a fresh thread, so sets are pooled rather than kept
+        # per thread; a search takes one and hands it back when done.
+        self._scratch_pool = queue.SimpleQueue()
+
+    def new_visit(self):
+        # Take a free set of work arrays (allocating one if none is free) and
+        # start a traversal by bumping its generation instead of clearing the
+        # arrays: node i counts as visited iff visited[i] == gen. Return it
+        # with end_visit once the results are copied out.
+        try:
+            scratch = self._scratch_pool.get_nowait()
+        except queue.Empty:
+            scratch = SimpleNamespace(gen=np.iinfo(np.int32).max)
+        if scratch.gen == np.iinfo(np.int32).max:
+            n = self.n_nodes
+            scratch.visited = np.zeros(n, dtype=np.int32)
+            scratch.queue = np.empty(n, dtype=np.int32)
+            scratch.dist = np.empty(n, dtype=np.int32)
+            scratch.gen = 0
+        scratch.gen += 1
+        return scratch
+
+    def end_visit(self, scratch):
+        self._scratch_pool.put(scratch)
+
+def _csr(src, dst, n):
+    # Sort edges by source (stable, so per-node edge order is preserved) and
+    # turn per-source counts into row pointers.
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order]
+
 def load_kg(path="kg.json"):
-    data = json.loads(Path(path).read_text())
-    G = nx.DiGraph()
-    # Add nodes
-    for n in data["nodes"]:
-        G.add_node(n["id"], **n["props"])
-    # Add edges (typed)
+    data = orjson.loads(Path(path).read_bytes())
+    nodes = data["nodes"]
+    # Edge endpoints that aren't declared as nodes become prop-less nodes
+    # (as nx.DiGraph.add_edge would create them)
+    declared = {node["id"] for node in nodes}
     for e in data["edges"]:
-        G.add_edge(e["source"], e["target"], type=e.get("type","RELATED"))
+        for nid in (e["source"], e["target"]):
+            if nid not in declared:
+                declared.add(nid)
+                nodes.append({"id": nid, "props": {}})
+    G = KG([n["id"] for n in nodes])
+    n = G.n_nodes
+    # Brand / category / tag strings are interned to small ints
+    # (each new key gets the next id)
+    cat_to_id, brand_to_id = {}, {}
+    all_tags = sorted({t for node in nodes for t in node["props"].get("tags", [])})
+    tag_to_id = {t: b for b, t in enumerate(all_tags)}
+    G.names = [node["props"].get("name", node["id"]) for node in nodes]
+    G.is_prod = np.zeros(n, dtype=bool)
+    G.price = np.full(n, np.nan)
+    G.in_stock = np.zeros(n, dtype=bool)
+    G.brand_id = np.zeros(n, dtype=np.int32)
+    G.cat_id = np.full(n, -1, dtype=np.int32)
+    tag_rows, tag_ids = [], []
+    for i, node in enumerate(nodes):
+        props = node["props"]
+        G.is_prod[i] = props.get("type") == "product"
+        if props.get("price") is not None:
+            G.price[i] = props["price"]
+        G.in_stock[i] = props.get("in_stock", False)
+        G.brand_id[i] = brand_to_id.setdefault(props.get("brand"), len(brand_to_id))
+        if props.get("category"):
+            G.cat_id[i] = cat_to_id.setdefault(props["category"], len(cat_to_id))
+        for t in props.get("tags", []):
+            tag_rows.append(i)
+            tag_ids.append(tag_to_id[t])
+    G.categories, G.brands, G.tags = list(cat_to_id), list(brand_to_id), all_tags
+    G.cat_to_id, G.brand_to_id, G.tag_to_id = cat_to_id, brand_to_id, tag_to_id
+    # Tags as a bitset per node: tag b is bit (b & 63) of uint64 word b >> 6
+    G.tag_bits = np.zeros((n, max(1, -(-len(all_tags) // 64))), dtype=np.uint64)
+    tag_ids = np.array(tag_ids, dtype=np.uint64)
+    np.bitwise_or.at(G.tag_bits, (np.array(tag_rows, dtype=np.intp), (tag_ids >> np.uint64(6)).astype(np.intp)),
+                     np.left_shift(np.uint64(1), tag_ids & np.uint64(63)))
+
+    # Edges as undirected adjacency: each node's out-neighbors then its
+    # in-neighbors, in edge order, with repeats dropped (edge types only
+    # matter for SIMILAR_TO, below)
+    edges = data["edges"]
+    src = np.array([G.index[e["source"]] for e in edges], dtype=np.int32)
+    dst = np.array([G.index[e["target"]] for e in edges], dtype=np.int32)
+    u, v = np.concatenate((src, dst)), np.concatenate((dst, src))
+    _, first = np.unique(u.astype(np.int64) * n + v, return_index=True)
+    first.sort()
+    G.adj_indptr, G.adj_indices = _csr(u[first], v[first], n)
+
+    # Candidate universe: products that can be offered at all (in stock)
+    G.in_stock_products = np.flatnonzero(G.is_prod & G.in_stock).astype(np.int32)
+    # Inverted index: category -> its in-stock products, and category -> SIMILAR_TO categories
+    stocked = G.in_stock_products[G.cat_id[G.in_stock_products] >= 0]
+    stocked = stocked[np.argsort(G.cat_id[stocked], kind="stable")]
+    cats, starts = np.unique(G.cat_id[stocked], return_index=True)
+    G.products_by_category = dict(zip(cats.tolist(), np.split(stocked, starts[1:])))
+    similar_categories = {}
+    for e in edges:
+        if e.get("type") != "SIMILAR_TO":
+            continue
+        a, b = _intern(cat_to_id, e["source"]), _intern(cat_to_id, e["target"])
+        if a >= 0 and b >= 0 and a != b:
+            similar_categories.setdefault(a, set()).add(b)
+            similar_categories.setdefault(b, set()).add(a)
+    G.similar_categories = {c: sorted(s) for c, s in similar_categories.items()}
     return G
 
+def product_index(_G, version):
+    # Product ids for the selector and their display names. `version` is
+    # _G.version: the graph itself isn't hashed, so it keys any caching.
+    products = np.flatnonzero(_G.is_prod)
+    product_nodes = [_G.ids[i] for i in products]
+    product_display = {_G.ids[i]: _G.names[i] for i in products}
+    return product_nodes, product_display
+
 # ---------------------------
 # Helper accessors
 # ---------------------------
 def is_product(node, G):
-    return G.nodes[node].get("type") == "product"
+    return bool(G.is_prod[node])
 
 def get_price(node, G):
-    return G.nodes[node].get("price")
+    price = G.price[node]
+    return None if np.isnan(price) else float(price)
 
 def in_stock(node, G):
-    return G.nodes[node].get("in_stock", False)
+    return bool(G.in_stock[node])
 
 def get_brand(node, G):
-    return G.nodes[node].get("brand")
+    return G.brands[G.brand_id[node]]
 
 def get_tags(node, G):
-    return set(G.nodes[node].get("tags", []))
+    return tag_names(G, G.tag_bits[node])
+
+def _intern(table, s):
+    # Id of a string in one of G.brand_to_id / cat_to_id / tag_to_id, or -1
+    # (never matches) if the KG lacks it
+    return table.get(s, -1)
+
+def tag_mask(G, tag_ids):
+    # Bitset (same layout as G.tag_bits rows) for tag ids
+    mask = np.zeros(G.tag_bits.shape[1], dtype=np.uint64)
+    for b in tag_ids:
+        mask[b >> 6] |= np.uint64(1 << (b & 63))
+    return mask
+
+def tag_names(G, mask):
+    bits = np.unpackbits(mask.astype("<u8").view(np.uint8), bitorder="little")
+    return {G.tags[b] for b in np.flatnonzero(bits[:len(G.tags)])}
 
 def get_category(node, G):
-    return G.nodes[node].get("category")
+    cat = G.cat_id[node]
+    return G.categories[cat] if cat >= 0 else None
 
 # ---------------------------
 # Search / Ranking
 # ---------------------------
 def find_alternatives(G, requested_product_id, max_price=None, required_tags=None, optional_brand=None, max_results=3):
-    required_tags = set(required_tags or [])
-    if requested_product_id not in G:
+    # Required tags are carried as one bitset from here on
+    tag_ids = []
+    for t in sorted(set(required_tags or [])):
+        tag_ids.append(_intern(G.tag_to_id, t))
+        if tag_ids[-1] < 0:
+            return {"error": f"Unknown tag: {t}"}
+    req_mask = tag_mask(G, tag_ids)
+    # Preferred brand as an id (None = no preference)
+    opt_brand = _intern(G.brand_to_id, optional_brand) if optional_brand else None
+    requested = G.index.get(requested_product_id)
+    if requested is None:
         return {"error": "Requested product not found in KG."}
     # If requested product is available and matches constraints, return it
-    if is_product(requested_product_id, G) and in_stock(requested_product_id, G):
-        price_ok = (max_price is None) or (get_price(requested_product_id, G) <= max_price)
-        tags_ok = required_tags.issubset(get_tags(requested_product_id, G))
-        brand_ok = (optional_brand is None) or (get_brand(requested_product_id, G) == optional_brand)
-        if price_ok and tags_ok and brand_ok:
+    if is_product(requested, G):
+        if meets_constraints(G, np.array([requested]), max_price, req_mask, opt_brand)[0]:
             return {"exact_match": requested_product_id}
 
+    # Same or SIMILAR_TO categories give the highest-scoring alternatives, so
+    # look those up directly in the (in-stock) category index first
+    req_cat = int(G.cat_id[requested])
+    cands = np.empty(0, dtype=np.int32)
+    if req_cat >= 0:
+        pool = np.concatenate([G.products_by_category.get(c, cands)
+                               for c in [req_cat] + G.similar_categories.get(req_cat, [])])
+        pool = pool[pool != requested]
+        cands = pool[meets_constraints(G, pool, max_price, req_mask, opt_brand)]
+    # Score: prefer same category (0 distance to category), brand match, more tag overlap, cheaper price
+    scores, flags, missing = score_candidates(G, requested, cands, req_mask, opt_brand)
+
+    # Products in any other category get no category bonus, so they score at
+    # most `outside_best`. Only search the graph when the index can't fill
+    # max_results slots with candidates scoring above that.
+    outside_best = (1.0 if opt_brand is not None else 0.5) + (2.0 if req_mask.any() else 0.0)
+    if not np.isnan(G.price[requested]):
+        outside_best += 1.0
+    if np.count_nonzero(scores > outside_best) < max_results:
+        found = search_graph(G, requested, max_price, req_mask, opt_brand)
+        extra = found[~np.isin(found, cands)]
+        extra_scores, extra_flags, extra_missing = score_candidates(G, requested, extra, req_mask, opt_brand)
+        cands = np.concatenate((cands, extra))
+        scores = np.concatenate((scores, extra_scores))
+        flags = np.concatenate((flags, extra_flags))
+        missing = np.concatenate((missing, extra_missing))
+
+    # Rank by score desc then price asc. Partition first so only candidates
+    # scoring at least the max_results-th best score (ties included) get
+    # sorted; lexsort is stable, so full ties keep index / BFS discovery order.
+    top_k = np.arange(len(cands))
+    if 0 < max_results < len(cands):
+        kth_score = -np.partition(-scores, max_results - 1)[max_results - 1]
+        top_k = np.flatnonzero(scores >= kth_score)
+    order = top_k[np.lexsort((G.price[cands[top_k]], -scores[top_k]))]
+    top = [{"product": G.ids[cands[k]], "score": float(scores[k]),
+            "reasons": build_reasons(G, flags[k], missing[k])}
+           for k in order[:max_results]]
+    return {"alternatives": top}
+
+def search_graph(G, requested, max_price, req_mask, opt_brand):
     # Graph-based BFS from the requested node
     # We look for other product nodes reachable via:
     # product -> category -> other products (IS_A edges), or SIMILAR_TO edges between categories
-    # We'll perform BFS on the graph treating all edges equally, but track path and distances.
-    queue = deque()
-    visited = set([requested_product_id])
-    queue.append((requested_product_id, 0, [requested_product_id]))
-    candidates = []
-
-    while queue:
-        node, dist, path = queue.popleft()
-        # Consider neighbors (outgoing and incoming) to traverse graph as undirected
-        neighbors = list(G.successors(node)) + list(G.predecessors(node))
-        for nbr in neighbors:
-            if nbr in visited:
-                continue
-            visited.add(nbr)
-            new_path = path + [nbr]
-            # If neighbor is a product candidate (and not the requested product)
-            if is_product(nbr, G) and nbr != requested_product_id:
-                # Filter by in-stock and price and tags and optional brand
-                if not in_stock(nbr):
-                    pass
-                else:
-                    price_ok = (max_price is None) or (get_price(nbr, G) <= max_price)
-                    tags_ok = required_tags.issubset(get_tags(nbr, G))
-                    brand_ok = (optional_brand is None) or (get_brand(nbr, G) == optional_brand)
-                    if price_ok and tags_ok and brand_ok:
-                        # Score: prefer same category (0 distance to category), brand match, more tag overlap, cheaper price
-                        score, reasons = score_candidate(G, requested_product_id, nbr, required_tags, optional_brand)
-                        candidates.append({"product": nbr, "score": score, "reasons": reasons, "path": new_path})
-            # Continue BFS
-            if dist + 1 <= 4:  # limit depth to 4
-                queue.append((nbr, dist+1, new_path))
-
-    # Sort candidates by score desc then price asc
-    candidates = sorted(candidates, key=lambda x: (-x["score"], get_price(x["product"], G)))
-    top = candidates[:max_results]
-    return {"alternatives": top}
+    # We'll perform BFS on the graph treating all edges equally, tracking distances only.
+    # Products met on the way are only collected here; filtering and scoring
+    # run afterwards over the whole candidate array.
+    scratch = G.new_visit()
+    n_seen = bfs(requested, G.adj_indptr, G.adj_indices,
+                 scratch.visited, scratch.gen, scratch.queue, scratch.dist, 4)  # limit depth to 4
+    seen = scratch.queue[1:n_seen]
+    found = seen[G.is_prod[seen]]
+    G.end_visit(scratch)
+
+    # Filter by in-stock and price and tags and optional brand
+    return found[meets_constraints(G, found, max_price, req_mask, opt_brand)]
+
+def meets_constraints(G, nodes, max_price, req_mask, opt_brand):
+    # Boolean mask over `nodes`: in stock and within the user's constraints
+    ok = G.in_stock[nodes]
+    if max_price is not None:
+        ok &= G.price[nodes] <= max_price
+    if req_mask.any():
+        ok &= ((G.tag_bits[nodes] & req_mask) == req_mask).all(axis=1)
+    if opt_brand is not None:
+        ok &= G.brand_id[nodes] == opt_brand
+    return ok
 
 # ---------------------------
 # Scoring & Rule Explanations
 # ---------------------------
-def score_candidate(G, requested, candidate, required_tags, optional_brand):
-    score = 0.0
-    reasons = []
+# Rule flags set by score_candidates, and the reason string for each
+SAME_CATEGORY = 1 << 0
+RELATED_CATEGORY = 1 << 1
+BRAND_MATCH = 1 << 2
+DIFFERENT_BRAND = 1 << 3
+SAME_BRAND = 1 << 4
+ALL_TAGS_MATCHED = 1 << 5
+MISSING_TAGS = 1 << 6
+CHEAPER = 1 << 7
+MORE_EXPENSIVE = 1 << 8
+RULE_REASONS = [
+    (SAME_CATEGORY, "same_category"),
+    (RELATED_CATEGORY, "related_category"),
+    (BRAND_MATCH, "brand_match"),
+    (DIFFERENT_BRAND, "different_brand"),
+    (SAME_BRAND, "same_brand"),
+    (ALL_TAGS_MATCHED, "all_required_tags_matched"),
+    (MISSING_TAGS, "missing_tags"),
+    (CHEAPER, "cheaper_or_equal_price"),
+    (MORE_EXPENSIVE, "more_expensive"),
+]
+
+def score_candidates(G, requested, cands, req_mask, opt_brand):
+    # Scores every candidate in `cands` at once. Triggered rules come back as
+    # flag bits, plus the required tags each candidate lacks; build_reasons
+    # turns those into reason strings only for the candidates we return.
+    score = np.zeros(len(cands))
+    flags = np.zeros(len(cands), dtype=np.int32)
+    missing = np.zeros((len(cands), req_mask.shape[0]), dtype=np.uint64)
 
-    req_cat = get_category(requested, G)
-    cand_cat = get_category(candidate, G)
+    req_cat = G.cat_id[requested]
+    cand_cat = G.cat_id[cands]
     # Rule: same_category -> strong boost
-    if req_cat and cand_cat and req_cat == cand_cat:
-        score += 3.0
-        reasons.append("same_category")
-    else:
-        # Check if categories are connected via SIMILAR_TO or shared parent in KG
-        if categories_are_similar(G, req_cat, cand_cat):
-            score += 1.5
-            reasons.append("related_category")
+    same_cat = (cand_cat == req_cat) & (req_cat >= 0)
+    score += 3.0 * same_cat
+    flags[same_cat] |= SAME_CATEGORY
+    # Otherwise check if categories are connected via SIMILAR_TO in KG. The
+    # related set is fixed for the query, so resolve it once (and skip the
+    # rule entirely when the requested category has none).
+    related_cats = G.similar_categories.get(int(req_cat), [])
+    related = np.isin(cand_cat, related_cats) if related_cats else np.zeros(len(cands), dtype=bool)
+    score += 1.5 * related
+    flags[related] |= RELATED_CATEGORY
 
     # Brand preference
-    if optional_brand:
-        if get_brand(candidate, G) == optional_brand:
-            score += 1.0
-            reasons.append("brand_match")
-        else:
-            reasons.append("different_brand")
+    cand_brand = G.brand_id[cands]
+    if opt_brand is not None:
+        brand_match = cand_brand == opt_brand
+        score += 1.0 * brand_match
+        flags |= np.where(brand_match, BRAND_MATCH, DIFFERENT_BRAND)
     else:
         # if same brand as requested, small boost
-        if get_brand(candidate, G) == get_brand(requested, G):
-            score += 0.5
-            reasons.append("same_brand")
+        same_brand = cand_brand == G.brand_id[requested]
+        score += 0.5 * same_brand
+        flags[same_brand] |= SAME_BRAND
 
     # Tag coverage: each required tag matched gives +1
-    cand_tags = get_tags(candidate, G)
-    matched_tags = required_tags.intersection(cand_tags)
-    if required_tags:
-        if matched_tags == required_tags:
-            score += 2.0
-            reasons.append("all_required_tags_matched")
-        else:
-            missing = required_tags - matched_tags
-            # allow partial but penalize
-            score += 0.5 * len(matched_tags)
-            reasons.append(f"missing_tags:{','.join(sorted(missing))}")
-
-    # Price: cheaper than requested gives boost
-    try:
-        req_price = get_price(requested, G)
-        cand_price = get_price(candidate, G)
-        if req_price is not None and cand_price is not None:
-            if cand_price <= req_price:
-                score += 1.0
-                reasons.append("cheaper_or_equal_price")
-            else:
-                # small penalty for being more expensive
-                score -= 0.5 * ((cand_price - req_price) / max(1.0, req_price))
-                reasons.append("more_expensive")
-    except Exception:
-        pass
-
-    return score, reasons
-
-def categories_are_similar(G, cat_a, cat_b):
-    if not cat_a or not cat_b:
-        return False
-    if cat_a == cat_b:
-        return True
-    # Look for SIMILAR_TO edges between categories
-    if G.has_edge(cat_a, cat_b):
-        for e in G.get_edge_data(cat_a, cat_b).values():
-            if e.get("type") == "SIMILAR_TO":
-                return True
-    if G.has_edge(cat_b, cat_a):
-        for e in G.get_edge_data(cat_b, cat_a).values():
-            if e.get("type") == "SIMILAR_TO":
-                return True
-    return False
+    if req_mask.any():
+        missing = req_mask & ~G.tag_bits[cands]
+        all_tags = ~missing.any(axis=1)
+        n_matched = np.bitwise_count(G.tag_bits[cands] & req_mask).sum(axis=1)
+        # allow partial but penalize
+        score += np.where(all_tags, 2.0, 0.5 * n_matched)
+        flags |= np.where(all_tags, ALL_TAGS_MATCHED, MISSING_TAGS)
+
+    # Price: cheaper than requested gives boost. A missing price is NaN, which
+    # fails both comparisons, so only priced candidates are affected.
+    req_price = G.price[requested]
+    if not np.isnan(req_price):
+        cand_price = G.price[cands]
+        cheaper = cand_price <= req_price
+        more_expensive = cand_price > req_price
+        score += 1.0 * cheaper
+        flags[cheaper] |= CHEAPER
+        # small penalty for being more expensive
+        score -= np.where(more_expensive, 0.5 * ((cand_price - req_price) / max(1.0, req_price)), 0.0)
+        flags[more_expensive] |= MORE_EXPENSIVE
+
+    return score, flags, missing
+
+def build_reasons(G, flags, missing):
+    # Reason strings for one candidate's rule flags, in rule order
+    reasons = []
+    for flag, reason in RULE_REASONS:
+        if not flags & flag:
+            continue
+        if flag == MISSING_TAGS:
+            reason = f"missing_tags:{','.join(sorted(tag_names(G, missing)))}"
+        reasons.append(reason)
+    return reasons
 
 # ---------------------------
 # Human-readable explanation generator
 # ---------------------------
+def format_price(price):
+    # Display form of get_price(): rupees, whole amounts without a trailing ".0"
+    if price is None:
+        return "n/a"
+    return f"₹{int(price)}" if price.is_integer() else f"₹{price}"
+
 def human_explanation(G, requested, candidate_entry):
-    candidate = candidate_entry["product"]
-    reasons = candidate_entry["reasons"]
+    candidate = G.index[candidate_entry["product"]]
+    # Set for O(1) rule lookups; missing_tags is the one reason with a payload
+    reasons = set(candidate_entry["reasons"])
+    missing = next((r.split(":", 1)[1] for r in reasons if r.startswith("missing_tags:")), None)
     expl = []
-    node = G.nodes[candidate]
-    title = node.get("name", candidate)
+    title = G.names[candidate]
     # Rule-based mapping
     if "same_category" in reasons and "same_brand" in reasons:
         expl.append(f"{title} is from the same category and same brand as requested.")
@@ -189,15 +385,13 @@ def human_explanation(G, requested, candidate_entry):
         expl.append(f"{title} is in the same category and matches the preferred brand.")
     elif "same_category" in reasons:
         expl.append(f"{title} is in the same category as the requested product.")
-    elif any(r.startswith("related_category") for r in reasons):
+    elif "related_category" in reasons:
         expl.append(f"{title} is from a related category (closely related product).")
     # Tags
-    for r in reasons:
-        if r.startswith("all_required_tags_matched"):
-            expl.append("Matches all required tags.")
-        if r.startswith("missing_tags"):
-            missing = r.split(":",1)[1]
-            expl.append(f"Missing required tags: {missing}.")
+    if "all_required_tags_matched" in reasons:
+        expl.append("Matches all required tags.")
+    if missing is not None:
+        expl.append(f"Missing required tags: {missing}.")
     # Price hints
     if "cheaper_or_equal_price" in reasons:
         expl.append("Cheaper or equal in price compared to requested product.")
@@ -209,22 +403,25 @@ def human_explanation(G, requested, candidate_entry):
     if "different_brand" in reasons:
         expl.append("Different brand (but meets other constraints).")
     # Always include price and stock info
-    expl.append(f"Price: ₹{get_price(candidate, G)}; In stock: {in_stock(candidate, G)}; Brand: {get_brand(candidate, G)}")
+    expl.append(f"Price: {format_price(get_price(candidate, G))}; In stock: {in_stock(candidate, G)}; Brand: {get_brand(candidate, G)}")
     return " ".join(expl)
 
 # ---------------------------
 # Streamlit UI
 # ---------------------------
 def main():
+    # Imported here so batch / CLI users of the search functions don't pay
+    # for Streamlit at import time
+    import streamlit as st
+
     st.set_page_config(page_title="Shopkeeper Product Substitution Assistant", layout="centered")
     st.title("Shopkeeper Product Substitution Assistant (KG + Rule-based)")
 
-    # Load KG
-    G = load_kg("kg.json")
+    # Load KG (built once per process, then served from cache on reruns)
+    G = st.cache_resource(load_kg)("kg.json")
 
     # Prepare product list for selection
-    product_nodes = [n for n in G.nodes if is_product(n, G)]
-    product_display = {n: G.nodes[n].get("name", n) for n in product_nodes}
+    product_nodes, product_display = st.cache_data(product_index)(G, G.version)
 
     requested = st.selectbox("Select requested product", options=product_nodes, format_func=lambda x: product_display[x])
     cols = st.columns(3)
@@ -243,9 +440,8 @@ def main():
             return
         if res.get("exact_match"):
             st.success("Exact product available that matches your constraints:")
-            pid = res["exact_match"]
-            p = G.nodes[pid]
-            st.write(f"**{p.get('name')}** — ₹{p.get('price')} — Brand: {p.get('brand')} — Tags: {', '.join(p.get('tags',[]))} — In stock: {p.get('in_stock')}")
+            i = G.index[res["exact_match"]]
+            st.write(f"**{G.names[i]}** — {format_price(get_price(i, G))} — Brand: {get_brand(i, G)} — Tags: {', '.join(sorted(get_tags(i, G)))} — In stock: {in_stock(i, G)}")
             return
         alts = res.get("alternatives", [])
         if not alts:
@@ -253,9 +449,8 @@ def main():
             return
         st.subheader("Suggested alternatives")
         for alt in alts:
-            pid = alt["product"]
-            node = G.nodes[pid]
-            st.markdown(f"**{node.get('name')}** — ₹{node.get('price')} — Brand: {node.get('brand')}")
+            i = G.index[alt["product"]]
+            st.markdown(f"**{G.names[i]}** — {format_price(get_price(i, G))} — Brand: {get_brand(i, G)}")
             expl = human_explanation(G, requested, alt)
             st.write(f"**Explanation (rule-derived):** {expl}")
             st.write("---")
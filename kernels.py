@@ -0,0 +1,33 @@
+# kernels.py
+# Numba-compiled inner loops used by app.py. They live in their own module
+# so the on-disk compile cache (cache=True) is keyed to a stable module name
+# whether app.py runs under Streamlit (as __main__) or is imported.
+from numba import njit
+
+# ---------------------------
+# Graph traversal
+# ---------------------------
+@njit(cache=True)
+def bfs(start, indptr, indices, visited, gen, queue, dist, max_depth):
+    # BFS over the undirected CSR adjacency, expanding nodes at most
+    # max_depth hops away (so their neighbours, one hop further out, are
+    # reached too). Returns how many nodes were reached; queue[:count] holds
+    # them in discovery order (start first).
+    visited[start] = gen
+    queue[0] = start
+    dist[start] = 0
+    head, tail = 0, 1
+    while head < tail:
+        u = queue[head]
+        head += 1
+        if dist[u] > max_depth:
+            break
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            if visited[v] == gen:
+                continue
+            visited[v] = gen
+            dist[v] = dist[u] + 1
+            queue[tail] = v
+            tail += 1
+    return tail